@@ -2,28 +2,52 @@
 graph.py - Multi-step LangGraph workflow.
 
 Graph nodes:
-  1. intent_analysis   - Semantically analyzes the user intent
-  2. plan_generation   - Builds a structured JSON plan
-  3. tool_execution    - Executes one tool from the plan
-  4. validation        - Validates the result before proceeding
-  5. completion        - Finalizes and summarizes the result
+  1. intent_and_plan   - Analyzes the user intent and plans (speculatively when possible)
+  2. tool_execution    - Executes the next batch of independent plan steps
+  3. validation        - Validates the result before proceeding
+  4. completion        - Finalizes and summarizes the result
 
-State is stored in AgentState (TypedDict).
+intent_and_plan fuses the intent_analysis and plan_generation steps.
+
+All nodes are coroutines; the graph is run with ainvoke/astream so
+concurrent chat sessions share one event loop.
+
+The graph is checkpointed to SQLite after every node, so a failed run can
+be resumed on the same thread_id instead of starting over.
+
+State is stored in AgentState (TypedDict). Nodes return only the keys they
+change; step_log and results_history are accumulated by list reducers.
 """
 
+import asyncio
+import copy
+import hashlib
 import json
+import os
 import re
-from typing import Any, TypedDict
+from operator import add
+from typing import Annotated, Any, Optional, TypedDict, Union
 
+import aiosqlite
+import numpy as np
+import orjson
+
+from langgraph.cache.memory import InMemoryCache
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langgraph.graph import END, StateGraph
+from langgraph.types import CachePolicy
 from langchain_core.messages import HumanMessage
+from pydantic import BaseModel
 
-from llm import get_llm
+from llm import get_embeddings, get_llm, get_llm_json
 from tools import ALL_TOOLS
 
 # Map tool name -> tool function
 TOOL_MAP = {tool.name: tool for tool in ALL_TOOLS}
 
+# Tools that do not touch the shared browser page and may run concurrently
+PARALLEL_SAFE_TOOLS = {"search_web"}
+
 # Agent state
 
 
@@ -33,42 +57,244 @@ class AgentState(TypedDict):
     plan: list  # Step list [{step, action, input}]
     current_step: int  # Current step index
     last_result: str  # Last tool output
-    results_history: list  # History of all step outputs
+    results_history: Annotated[list, add]  # History of step summaries
     final_answer: str  # Final answer for the user
     error: str  # Error message (if any)
-    step_log: list  # Detailed log for Chainlit
+    step_log: Annotated[list, add]  # Detailed log for Chainlit
     _validation: dict  # Validation cache for routing
 
 
-# LLM
-llm = get_llm()
+# Structured LLM outputs
+
+
+class IntentOut(BaseModel):
+    intent_summary: str
+    target_domain: Optional[str] = None
+    main_action: str = ""
+    semantic_constraints: list[str] = []
+    needs_search: bool = False
+
+
+class PlanStep(BaseModel):
+    step: int
+    action: str
+    input: Union[str, dict[str, Any]] = ""
+    description: str = ""
+    depends_on: list[int] = []
+
+
+class PlanOut(BaseModel):
+    steps: list[PlanStep]
+
+
+class ValidationOut(BaseModel):
+    success: bool
+    can_continue: bool
+    notes: str = ""
+    extracted_info: str = ""
+
+
+# LLMs (decode budget specialized per node; JSON nodes decode against a schema)
+_LLM_INTENT = get_llm_json(IntentOut, 0.1, 256)
+_LLM_PLAN = get_llm_json(PlanOut, 0.2, 1024)
+_LLM_VALIDATE = get_llm_json(ValidationOut, 0.0, 128)
+_LLM_COMPLETE = get_llm(0.3, 512)
+
+# Prompt templates (built once; only per-request values are formatted in).
+# Per-request values come last so every call shares a byte-identical prefix,
+# which lets Ollama reuse the KV cache for the static instructions.
+_TOOLS_DESC = "\n".join(f"- {tool.name}: {tool.description}" for tool in ALL_TOOLS)
+
+_INTENT_PROMPT = """You are a web agent specialized in semantic intent analysis.
+
+Analyze the user request at the end of this message and extract:
+1. The real intent (what the user wants to do)
+2. The target domain/service (YouTube, a specific site, etc.)
+3. The main action (navigate, click, fill, extract, etc.)
+4. Important semantic constraints (e.g., use ONLY youtube.com, not alternative sites)
+
+Respond in JSON with this format:
+{{
+  "intent_summary": "clear intent summary",
+  "target_domain": "target domain or service (null if not specified)",
+  "main_action": "main action",
+  "semantic_constraints": ["list of important semantic constraints"],
+  "needs_search": true/false
+}}
+
+User request: "{user_input}"
+"""
+
+_PLAN_PROMPT = """You are an autonomous web agent. Create a DETAILED execution plan
+for the user intent given at the end of this message.
+
+Available tools:
+{tools_desc}
+
+CRITICAL RULES:
+1. NEVER hardcode URLs - always use search_web first to discover official URLs
+2. If intent mentions YouTube, URL MUST be youtube.com (not alternative websites)
+3. Always inspect page elements with extract_page_elements before clicking
+4. Plan step by step without skipping stages
+5. If a specific site URL is needed, use search_web as the first step
+6. In depends_on, list the step numbers whose results this step needs (empty if none)
+
+Generate a JSON object with the list of steps:
+{{
+  "steps": [
+    {{
+      "step": 1,
+      "action": "tool_name",
+      "input": "tool parameter",
+      "description": "what this step does",
+      "depends_on": []
+    }},
+    ...
+  ]
+}}
+
+For tools with multiple parameters (type_text), use:
+  "input": {{"selector": "...", "text": "..."}}
+
+Be specific and complete. Output ONLY JSON, with no extra text.
+
+User intent: "{intent}"
+Original request: "{user_input}"
+"""
+
+_VALIDATION_PROMPT = """You are a web-agent validator.
+
+Given the action result at the end of this message, evaluate whether:
+1. The result indicates success or failure
+2. It is safe to continue to the next step
+3. There is relevant information to extract from the result
+
+Respond in JSON:
+{{
+  "success": true/false,
+  "can_continue": true/false,
+  "notes": "observations about the result",
+  "extracted_info": "useful extracted information (e.g., discovered URL, visible elements, etc.)"
+}}
+
+Current step: {current_step} of {plan_size}
+More steps remaining: {has_more_steps}
+Error detected: {has_error}
+Latest action result: "{last_result}"
+"""
+
+_COMPLETION_PROMPT = """You are a web agent that just completed a task.
+
+Generate a clear and objective summary of what was done, including:
+- What was completed successfully
+- Results obtained
+- Whether the task is complete or needs human intervention
+- Suggested next steps (if applicable)
+
+Respond in concise and useful English.
+
+Original task: "{user_input}"
+Intent: "{intent}"
+
+Execution history:
+{history_text}"""
+
+# Semantic caches (reuse intent analysis and plans for near-identical requests)
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE_ENABLED", "0") == "1"
+INTENT_CACHE_THRESHOLD = 0.95
+PLAN_CACHE_THRESHOLD = 0.93
+
+# Speculative planning (plan from the raw input while the intent is analyzed).
+# Needs the embedding model to compare intents; without it the node plans
+# sequentially instead of wasting a plan decode.
+SPECULATIVE_PLANNING_ENABLED = os.environ.get("SPECULATIVE_PLANNING_ENABLED", "1") == "1"
+
+# Minimum similarity between analyzed intent and raw input to keep a speculative plan
+SPECULATION_THRESHOLD = 0.9
+
+# Whether the embedding model answered (probed once per process)
+_embeddings_available: Optional[bool] = None
+
+# Embedding classifier for intent analysis (LLM is the fallback for low scores)
+INTENT_CLASSIFIER_ENABLED = os.environ.get("INTENT_CLASSIFIER_ENABLED", "0") == "1"
+INTENT_CLASSIFIER_MIN_SCORE = 0.6
+
+# Labeled example phrases per main action (class prototypes)
+_ACTION_EXAMPLES = {
+    "navigate": [
+        "open the website",
+        "go to the official site",
+        "visit the homepage",
+    ],
+    "search": [
+        "search for apartments",
+        "look up information about",
+        "find results for",
+    ],
+    "play": [
+        "play a music video",
+        "watch a random video",
+        "play a song",
+    ],
+    "fill": [
+        "fill in the form",
+        "type my email address",
+        "log in with my account",
+    ],
+    "extract": [
+        "read the top headline",
+        "find the customer service phone number",
+        "get the price of the product",
+    ],
+}
+
+# Length of the result summary kept per step in results_history
+RESULT_SUMMARY_CHARS = 300
+
+# last_result bound
+LAST_RESULT_MAX_CHARS = 2000
+LAST_RESULT_HEAD_CHARS = 1800
+
+# Preview lengths of step_log entries (truncated once, when the entry is written)
+PLAN_INPUT_PREVIEW_CHARS = 100
+LOG_INPUT_PREVIEW_CHARS = 150
+LOG_RESULT_PREVIEW_CHARS = 400
 
 # Helpers
 
+# JSON extraction pattern (compiled once): fenced block, array or object
+_JSON_ANY_RE = re.compile(
+    r"```(?:json)?\s*([\s\S]*?)```|(\[[\s\S]*\])|(\{[\s\S]*\})"
+)
+
+# Error keywords in tool output (single case-insensitive pass)
+_ERROR_KEYWORDS_RE = re.compile(
+    "|".join(map(re.escape, ["error", "exception", "not found", "timeout", "blocked"])),
+    re.IGNORECASE,
+)
+
+# Results that always go through LLM validation, even when short
+_SUSPICIOUS_RESULT_RE = re.compile("captcha|login|blocked|\u26a0", re.IGNORECASE)
+AUTO_PASS_MAX_RESULT_CHARS = 400
+
+# User input that is nothing but a URL
+_BARE_URL_RE = re.compile(r"^https?://\S+$")
+
 
 def extract_json(text: str) -> Any:
     """Extracts the first valid JSON block from a string."""
-    # Try fenced block: ```json ... ```
-    match = re.search(r"```(?:json)?\s*([\s\S]*?)```", text)
-    if match:
+    # Fast path: the whole response is JSON (Ollama JSON mode)
+    stripped = text.strip()
+    if stripped and stripped[0] in "[{":
         try:
-            return json.loads(match.group(1))
+            return orjson.loads(stripped)
         except Exception:
             pass
 
-    # Try direct JSON array
-    match = re.search(r"\[[\s\S]*\]", text)
-    if match:
+    # Single pass: try fenced blocks / arrays / objects in order of appearance
+    for match in _JSON_ANY_RE.finditer(text):
         try:
-            return json.loads(match.group(0))
-        except Exception:
-            pass
-
-    # Try direct JSON object
-    match = re.search(r"\{[\s\S]*\}", text)
-    if match:
-        try:
-            return json.loads(match.group(0))
+            return orjson.loads(match.group(match.lastindex))
         except Exception:
             pass
 
@@ -76,277 +302,584 @@ def extract_json(text: str) -> Any:
 
 
 
+def structured_data(result: dict) -> Any:
+    """
+    Returns a structured LLM output as plain data.
+    Falls back to extract_json on the raw message when schema parsing failed.
+    """
+    parsed = result.get("parsed")
+    if parsed is not None:
+        return parsed.model_dump()
+    return extract_json(result["raw"].content)
+
+
+
+class SemanticCache:
+    """
+    In-process vector store mapping query embeddings to cached values.
+
+    Vectors are L2-normalized on insert, so a single matrix-vector product
+    yields the cosine similarity against every stored query.
+    """
+
+    def __init__(self, threshold: float, max_entries: int = 1024):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._matrix: Optional[np.ndarray] = None
+        self._values: list = []
+
+    @staticmethod
+    def normalize(vector: Any) -> np.ndarray:
+        """Converts an embedding to a unit-length float32 vector."""
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def lookup(self, vector: np.ndarray) -> Optional[Any]:
+        """Returns the value of the most similar entry above the threshold."""
+        if self._matrix is None:
+            return None
+        scores = self._matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] >= self.threshold:
+            return self._values[best]
+        return None
+
+    def add(self, vector: np.ndarray, value: Any) -> None:
+        """Stores a value, evicting the oldest entry when full."""
+        if self._matrix is None:
+            self._matrix = vector[np.newaxis, :]
+        else:
+            self._matrix = np.vstack([self._matrix, vector])
+        self._values.append(value)
+
+        if len(self._values) > self.max_entries:
+            self._matrix = self._matrix[1:]
+            self._values.pop(0)
+
+
+_intent_cache = SemanticCache(threshold=INTENT_CACHE_THRESHOLD)
+_plan_cache = SemanticCache(threshold=PLAN_CACHE_THRESHOLD)
+
+
+
+class PrototypeClassifier:
+    """
+    Nearest-centroid classifier over embeddings of labeled example phrases.
+
+    Centroids are embedded lazily on first use; classify() returns the best
+    label and its cosine similarity to the query.
+    """
+
+    def __init__(self, examples: dict[str, list[str]]):
+        self.examples = examples
+        self._labels = list(examples)
+        self._centroids: Optional[np.ndarray] = None
+
+    async def _ensure_centroids(self) -> np.ndarray:
+        if self._centroids is None:
+            embeddings = get_embeddings()
+            rows = []
+            for label in self._labels:
+                vectors = await embeddings.aembed_documents(self.examples[label])
+                rows.append(SemanticCache.normalize(np.mean(vectors, axis=0)))
+            self._centroids = np.vstack(rows)
+        return self._centroids
+
+    async def classify(self, vector: np.ndarray) -> tuple[str, float]:
+        """Returns (label, score) for a normalized query vector."""
+        scores = await self._ensure_centroids() @ vector
+        best = int(np.argmax(scores))
+        return self._labels[best], float(scores[best])
+
+
+_action_classifier = PrototypeClassifier(_ACTION_EXAMPLES)
+
+
+
+def truncate_result(result: str) -> str:
+    """
+    Bounds a tool output before it enters the state as last_result.
+    Long outputs keep their head plus the original length and a short hash.
+    """
+    if len(result) < LAST_RESULT_MAX_CHARS:
+        return result
+    digest = hashlib.sha1(result.encode("utf-8")).hexdigest()[:8]
+    return (
+        f"{result[:LAST_RESULT_HEAD_CHARS]}"
+        f"...[trunc {len(result)} chars, sha={digest}]"
+    )
+
+
+
+def preview(value: Any, limit: int) -> str:
+    """Returns str(value) cut to limit chars, with "..." when it was cut."""
+    text = str(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+
+def plan_input_previews(plan: list[dict]) -> list[str]:
+    """Returns the preview of each plan step input ("" for empty inputs)."""
+    return [
+        preview(step.get("input", ""), PLAN_INPUT_PREVIEW_CHARS) if step.get("input") else ""
+        for step in plan
+    ]
+
+
+
+async def embed_text(text: str) -> Optional[np.ndarray]:
+    """Embeds text for semantic cache lookups. Returns None on failure."""
+    try:
+        return SemanticCache.normalize(await get_embeddings().aembed_query(text))
+    except Exception:
+        return None
+
+
+
+async def embeddings_available() -> bool:
+    """Probes the embedding model once and remembers whether it is usable."""
+    global _embeddings_available
+    if _embeddings_available is None:
+        _embeddings_available = await embed_text("ping") is not None
+    return _embeddings_available
+
+
+
+async def intents_match(intent: str, user_input: str) -> bool:
+    """Checks whether the analyzed intent is semantically close to the raw input."""
+    if intent.strip().lower() == user_input.strip().lower():
+        return True
+
+    intent_vector, input_vector = await asyncio.gather(
+        embed_text(intent), embed_text(user_input)
+    )
+    if intent_vector is None or input_vector is None:
+        return False
+    return float(intent_vector @ input_vector) >= SPECULATION_THRESHOLD
+
+
+# Service name mentioned in the intent -> domain the URL must contain
+_DOMAIN_RULES = {
+    "youtube": "youtube.com",
+    "google": "google.com",
+    "instagram": "instagram.com",
+    "facebook": "facebook.com",
+    "twitter": "twitter.com",
+    "linkedin": "linkedin.com",
+    "github": "github.com",
+    "amazon": "amazon.com",
+}
+_DOMAIN_NAME_RE = re.compile("|".join(map(re.escape, _DOMAIN_RULES)))
+
+
+
 def semantic_url_check(intent: str, url: str) -> bool:
     """
     Checks whether a URL semantically matches the user's intent.
     Returns False when a semantic mismatch is detected.
     """
-    intent_lower = intent.lower()
     url_lower = url.lower()
 
-    # If intent mentions YouTube, URL must contain youtube.com
-    if "youtube" in intent_lower and "youtube.com" not in url_lower:
-        return False
-
-    # If intent mentions a known domain, ensure domain matches
-    known_domains = [
-        "google.com",
-        "instagram.com",
-        "facebook.com",
-        "twitter.com",
-        "linkedin.com",
-        "github.com",
-        "amazon.com",
-    ]
-    for domain in known_domains:
-        name = domain.split(".")[0]
-        if name in intent_lower and domain not in url_lower:
+    # If intent mentions a known service, URL must contain its domain
+    for name in set(_DOMAIN_NAME_RE.findall(intent.lower())):
+        if _DOMAIN_RULES[name] not in url_lower:
             return False
 
     return True
 
 
+async def classify_intent(user_input: str, vector: np.ndarray) -> Optional[dict]:
+    """
+    Builds the intent dict without the LLM: the main action comes from the
+    embedding classifier and the target domain from the known-domain table.
+    Returns None when the classifier is not confident enough.
+    """
+    try:
+        action, score = await _action_classifier.classify(vector)
+    except Exception:
+        return None
+    if score < INTENT_CLASSIFIER_MIN_SCORE:
+        return None
+
+    names = sorted(set(_DOMAIN_NAME_RE.findall(user_input.lower())))
+    domains = [_DOMAIN_RULES[name] for name in names]
+    return {
+        "intent_summary": user_input,
+        "target_domain": domains[0] if domains else None,
+        "main_action": action,
+        "semantic_constraints": [f"use ONLY {domain}" for domain in domains],
+        "needs_search": True,
+    }
+
+
+def direct_navigation_plan(url: str) -> dict:
+    """Builds the intent and a one-step open_url plan for a bare URL request."""
+    intent = f"Open {url}"
+    plan = [
+        {
+            "step": 1,
+            "action": "open_url",
+            "input": url,
+            "description": "Direct navigation",
+            "direct": True,  # The user typed this URL: skip the semantic guard
+        }
+    ]
+
+    return {
+        "intent": intent,
+        "plan": plan,
+        "current_step": 0,
+        "step_log": [
+            {
+                "node": "intent_analysis",
+                "intent": intent,
+                "details": {"target_domain": url, "main_action": "navigate"},
+            },
+            {
+                "node": "plan_generation",
+                "plan": plan,
+                "plan_size": len(plan),
+                "input_previews": plan_input_previews(plan),
+            },
+        ],
+    }
+
+
 # Graph nodes
 
 
-def intent_analysis(state: AgentState) -> AgentState:
+async def intent_analysis(state: AgentState) -> dict:
     """
-    Node 1: Semantically analyzes user intent.
+    Step 1a: Semantically analyzes user intent.
     Distinguishes explicit intent from literal URL text and captures the real goal.
     """
-    prompt = f"""You are a web agent specialized in semantic intent analysis.
+    prompt = _INTENT_PROMPT.format(user_input=state["user_input"])
 
-Analyze the user request below and extract:
-1. The real intent (what the user wants to do)
-2. The target domain/service (YouTube, a specific site, etc.)
-3. The main action (navigate, click, fill, extract, etc.)
-4. Important semantic constraints (e.g., use ONLY youtube.com, not alternative sites)
+    use_embeddings = SEMANTIC_CACHE_ENABLED or INTENT_CLASSIFIER_ENABLED
+    query_vector = await embed_text(state["user_input"]) if use_embeddings else None
 
-User request: "{state['user_input']}"
+    cached = None
+    if SEMANTIC_CACHE_ENABLED and query_vector is not None:
+        cached = _intent_cache.lookup(query_vector)
 
-Respond in JSON with this format:
-{{
-  "intent_summary": "clear intent summary",
-  "target_domain": "target domain or service (null if not specified)",
-  "main_action": "main action",
-  "semantic_constraints": ["list of important semantic constraints"],
-  "needs_search": true/false
-}}"""
+    classified = None
+    if cached is None and INTENT_CLASSIFIER_ENABLED and query_vector is not None:
+        classified = await classify_intent(state["user_input"], query_vector)
 
-    response = llm.invoke([HumanMessage(content=prompt)])
-    try:
-        data = extract_json(response.content)
-        intent = data.get("intent_summary", state["user_input"])
-    except Exception:
-        intent = state["user_input"]
-        data = {}
+    if cached is not None:
+        intent, data = cached
+    elif classified is not None:
+        intent, data = state["user_input"], classified
+    else:
+        result = await _LLM_INTENT.ainvoke([HumanMessage(content=prompt)])
+        try:
+            data = structured_data(result)
+            intent = data.get("intent_summary", state["user_input"])
+        except Exception:
+            intent = state["user_input"]
+            data = {}
+
+        if SEMANTIC_CACHE_ENABLED and query_vector is not None and data:
+            _intent_cache.add(query_vector, (intent, data))
 
     log_entry = {
         "node": "intent_analysis",
         "intent": intent,
         "details": data,
+        "cached": cached is not None,
+        "classified": classified is not None,
     }
 
     return {
-        **state,
         "intent": intent,
-        "step_log": state.get("step_log", []) + [log_entry],
+        "step_log": [log_entry],
     }
 
 
 
-def plan_generation(state: AgentState) -> AgentState:
+async def plan_generation(state: AgentState) -> dict:
     """
-    Node 2: Creates a structured JSON plan with all required steps.
+    Step 1b: Creates a structured JSON plan with all required steps.
     The agent NEVER executes actions without a prior plan.
     """
-    tools_desc = "\n".join([f"- {tool.name}: {tool.description}" for tool in ALL_TOOLS])
-
-    prompt = f"""You are an autonomous web agent. Create a DETAILED execution plan.
-
-User intent: "{state['intent']}"
-Original request: "{state['user_input']}"
-
-Available tools:
-{tools_desc}
-
-CRITICAL RULES:
-1. NEVER hardcode URLs - always use search_web first to discover official URLs
-2. If intent mentions YouTube, URL MUST be youtube.com (not alternative websites)
-3. Always inspect page elements with extract_page_elements before clicking
-4. Plan step by step without skipping stages
-5. If a specific site URL is needed, use search_web as the first step
-
-Generate a JSON list:
-[
-  {{
-    "step": 1,
-    "action": "tool_name",
-    "input": "tool parameter",
-    "description": "what this step does"
-  }},
-  ...
-]
-
-For tools with multiple parameters (type_text), use:
-  "input": {{"selector": "...", "text": "..."}}
+    prompt = _PLAN_PROMPT.format(
+        intent=state["intent"], user_input=state["user_input"], tools_desc=_TOOLS_DESC
+    )
 
-Be specific and complete. Output ONLY JSON, with no extra text."""
+    query_vector = await embed_text(state["intent"]) if SEMANTIC_CACHE_ENABLED else None
+    cached = _plan_cache.lookup(query_vector) if query_vector is not None else None
 
-    response = llm.invoke([HumanMessage(content=prompt)])
+    if cached is not None:
+        plan = copy.deepcopy(cached)
+    else:
+        result = await _LLM_PLAN.ainvoke([HumanMessage(content=prompt)])
 
-    try:
-        plan = extract_json(response.content)
-        if not isinstance(plan, list):
-            plan = [plan]
-    except Exception:
-        # Minimal fallback plan
-        plan = [
-            {
-                "step": 1,
-                "action": "search_web",
-                "input": state["user_input"],
-                "description": "Initial search for the request",
-            }
-        ]
+        try:
+            plan = structured_data(result)
+            if isinstance(plan, dict) and "steps" in plan:
+                plan = plan["steps"]
+            if not isinstance(plan, list):
+                plan = [plan]
+            if query_vector is not None:
+                _plan_cache.add(query_vector, copy.deepcopy(plan))
+        except Exception:
+            # Minimal fallback plan
+            plan = [
+                {
+                    "step": 1,
+                    "action": "search_web",
+                    "input": state["user_input"],
+                    "description": "Initial search for the request",
+                }
+            ]
 
     log_entry = {
         "node": "plan_generation",
         "plan": plan,
         "plan_size": len(plan),
+        "input_previews": plan_input_previews(plan),
+        "cached": cached is not None,
     }
 
     return {
-        **state,
         "plan": plan,
         "current_step": 0,
-        "results_history": [],
-        "step_log": state.get("step_log", []) + [log_entry],
+        "step_log": [log_entry],
     }
 
 
 
-def tool_execution(state: AgentState) -> AgentState:
+async def intent_and_plan(state: AgentState) -> dict:
     """
-    Node 3: Executes the tool for the current plan step.
-    Supports single-parameter and multi-parameter tool calls.
+    Node 1: Runs intent analysis and plan generation.
+
+    When speculation is enabled and the embedding model is available, both
+    run concurrently: the speculative plan uses the raw user input as a proxy
+    intent and is kept when the analyzed intent stays semantically close to
+    the input; otherwise the plan is regenerated from the refined intent.
+    Without embeddings the plan is generated after the intent, sequentially.
+
+    A bare URL input skips both LLM calls and gets a direct open_url plan.
     """
-    plan = state["plan"]
-    idx = state["current_step"]
+    url = state["user_input"].strip()
+    if _BARE_URL_RE.match(url):
+        return direct_navigation_plan(url)
+
+    if SPECULATIVE_PLANNING_ENABLED and await embeddings_available():
+        intent_state, plan_state = await asyncio.gather(
+            intent_analysis(state),
+            plan_generation({**state, "intent": state["user_input"]}),
+        )
+        intent = intent_state["intent"]
+
+        speculative_hit = await intents_match(intent, state["user_input"])
+        if not speculative_hit:
+            plan_state = await plan_generation({**state, "intent": intent})
+    else:
+        intent_state = await intent_analysis(state)
+        intent = intent_state["intent"]
+        plan_state = await plan_generation({**state, "intent": intent})
+        speculative_hit = False
+
+    intent_log = intent_state["step_log"][-1]
+    plan_log = {**plan_state["step_log"][-1], "speculative": speculative_hit}
+
+    return {
+        "intent": intent,
+        "plan": plan_state["plan"],
+        "current_step": 0,
+        "step_log": [intent_log, plan_log],
+    }
+
 
-    if idx >= len(plan):
-        return {**state, "last_result": "Plan completed.", "current_step": idx}
 
-    step = plan[idx]
+def next_step_batch(plan: list, start: int) -> list[int]:
+    """
+    Returns the indexes of consecutive steps from start that can run together.
+
+    A step joins the batch when every step it depends_on has already run
+    (i.e. is before start). At most one step may touch the shared browser
+    page; the rest must be stateless tools.
+    """
+    batch: list[int] = []
+    uses_browser = False
+
+    for idx in range(start, len(plan)):
+        step = plan[idx]
+        depends_on = step.get("depends_on") or []
+        if any(isinstance(dep, int) and dep > start for dep in depends_on):
+            break
+
+        if step.get("action") not in PARALLEL_SAFE_TOOLS:
+            if uses_browser:
+                break
+            uses_browser = True
+
+        batch.append(idx)
+
+    return batch or [start]
+
+
+
+async def run_tool(state: AgentState, step: dict) -> str:
+    """
+    Executes the tool for one plan step and returns its output.
+    Supports single-parameter and multi-parameter tool calls.
+    """
     action = step.get("action", "")
     step_input = step.get("input", "")
-    description = step.get("description", action)
 
     tool_fn = TOOL_MAP.get(action)
     if not tool_fn:
-        result = f"Tool '{action}' not found."
-    else:
-        try:
-            # Semantic guard for open_url
-            if action == "open_url" and isinstance(step_input, str):
-                if not semantic_url_check(state.get("intent", ""), step_input):
-                    result = (
-                        f"URL '{step_input}' was BLOCKED due to semantic mismatch. "
-                        f"Intent is '{state['intent']}', and this URL does not match the expected domain."
-                    )
-                else:
-                    result = tool_fn.invoke(step_input)
-            elif isinstance(step_input, dict):
-                # Multiple parameters (e.g., type_text)
-                result = tool_fn.invoke(step_input)
-            else:
-                result = tool_fn.invoke(str(step_input))
-        except Exception as exc:
-            result = f"Error executing '{action}': {exc}"
-
-    history = state.get("results_history", []) + [
-        {
-            "step": idx + 1,
-            "action": action,
-            "input": step_input,
-            "result": result,
-            "description": description,
-        }
-    ]
+        return f"Tool '{action}' not found."
 
-    log_entry = {
-        "node": "tool_execution",
-        "step": idx + 1,
-        "action": action,
-        "input": step_input,
-        "description": description,
-        "result": result[:500],  # Trim for log readability
-    }
+    try:
+        # Semantic guard for planned open_url steps (input is the URL or {"url": ...});
+        # direct-navigation steps open the URL the user typed and skip it
+        if action == "open_url" and not step.get("direct"):
+            url = step_input.get("url", "") if isinstance(step_input, dict) else str(step_input)
+            if not semantic_url_check(state.get("intent", ""), url):
+                return (
+                    f"URL '{url}' was BLOCKED due to semantic mismatch. "
+                    f"Intent is '{state['intent']}', and this URL does not match the expected domain."
+                )
+            return await tool_fn.ainvoke(step_input)
+        if isinstance(step_input, dict):
+            # Multiple parameters (e.g., type_text)
+            return await tool_fn.ainvoke(step_input)
+        if not step_input:
+            # No input: let the tool use its defaults (e.g., extract_page_elements)
+            return await tool_fn.ainvoke({})
+        return await tool_fn.ainvoke(str(step_input))
+    except Exception as exc:
+        return f"Error executing '{action}': {exc}"
+
+
+
+async def tool_execution(state: AgentState) -> dict:
+    """
+    Node 2: Executes the next batch of plan steps.
+    Independent steps (see next_step_batch) run concurrently with
+    asyncio.gather; their entries are recorded in plan order.
+    """
+    plan = state["plan"]
+    idx = state["current_step"]
+
+    if idx >= len(plan):
+        return {"last_result": "Plan completed.", "current_step": idx}
+
+    batch = next_step_batch(plan, idx)
+    outcomes = await asyncio.gather(
+        *(run_tool(state, plan[i]) for i in batch), return_exceptions=True
+    )
+
+    results = []
+    history_entries = []
+    log_entries = []
+
+    for i, outcome in zip(batch, outcomes):
+        step = plan[i]
+        action = step.get("action", "")
+        step_input = step.get("input", "")
+        description = step.get("description", action)
+        result = (
+            f"Error executing '{action}': {outcome}"
+            if isinstance(outcome, BaseException)
+            else outcome
+        )
+        results.append(result)
+
+        # History keeps a short summary; last_result carries the (bounded) output
+        history_entries.append(
+            {
+                "step": i + 1,
+                "action": action,
+                "input": step_input,
+                "result_summary": str(result)[:RESULT_SUMMARY_CHARS],
+                "description": description,
+            }
+        )
+        log_entries.append(
+            {
+                "node": "tool_execution",
+                "step": i + 1,
+                "action": action,
+                "input": step_input,
+                "description": description,
+                "input_preview": preview(step_input, LOG_INPUT_PREVIEW_CHARS),
+                "result_preview": preview(result, LOG_RESULT_PREVIEW_CHARS),
+            }
+        )
+
+    if len(batch) == 1:
+        last_result = results[0]
+    else:
+        last_result = "\n\n".join(
+            f"[Step {entry['step']} - {entry['action']}]\n{result}"
+            for entry, result in zip(history_entries, results)
+        )
 
     return {
-        **state,
-        "last_result": result,
-        "current_step": idx + 1,
-        "results_history": history,
-        "step_log": state.get("step_log", []) + [log_entry],
+        "last_result": truncate_result(last_result),
+        "current_step": batch[-1] + 1,
+        "results_history": history_entries,
+        "step_log": log_entries,
     }
 
 
 
-def validation(state: AgentState) -> AgentState:
+async def validation(state: AgentState) -> dict:
     """
-    Node 4: Validates the latest tool result before moving on.
-    Detects failures, blocks, or needed adjustments.
+    Node 3: Validates the latest tool result before moving on.
+    Detects failures, blocks, or needed adjustments. Short, clean results
+    mid-plan are auto-passed without an LLM call.
     """
     last_result = state.get("last_result", "")
     current_step = state.get("current_step", 0)
     plan = state.get("plan", [])
 
     # Check for critical errors
-    has_error = any(
-        keyword in last_result.lower()
-        for keyword in [
-            "error",
-            "exception",
-            "not found",
-            "timeout",
-            "blocked",
-        ]
-    )
+    has_error = _ERROR_KEYWORDS_RE.search(last_result) is not None
 
     # Check whether more steps remain
     has_more_steps = current_step < len(plan)
 
-    prompt = f"""You are a web-agent validator.
-
-Latest action result: "{last_result[:600]}"
-Current step: {current_step} of {len(plan)}
-More steps remaining: {has_more_steps}
-Error detected: {has_error}
-
-Evaluate whether:
-1. The result indicates success or failure
-2. It is safe to continue to the next step
-3. There is relevant information to extract from the result
-
-Respond in JSON:
-{{
-  "success": true/false,
-  "can_continue": true/false,
-  "notes": "observations about the result",
-  "extracted_info": "useful extracted information (e.g., discovered URL, visible elements, etc.)"
-}}"""
+    # Obvious happy path: short plain-text result with nothing suspicious
+    auto_pass = (
+        not has_error
+        and has_more_steps
+        and len(last_result) < AUTO_PASS_MAX_RESULT_CHARS
+        and not last_result.lstrip().startswith(("[", "{"))
+        and _SUSPICIOUS_RESULT_RE.search(last_result) is None
+    )
 
-    try:
-        response = llm.invoke([HumanMessage(content=prompt)])
-        data = extract_json(response.content)
-    except Exception:
+    if auto_pass:
         data = {
-            "success": not has_error,
-            "can_continue": has_more_steps,
-            "notes": "",
+            "success": True,
+            "can_continue": True,
+            "notes": "auto-pass",
             "extracted_info": "",
         }
+    else:
+        prompt = _VALIDATION_PROMPT.format(
+            last_result=last_result[:600],
+            current_step=current_step,
+            plan_size=len(plan),
+            has_more_steps=has_more_steps,
+            has_error=has_error,
+        )
+
+        try:
+            result = await _LLM_VALIDATE.ainvoke([HumanMessage(content=prompt)])
+            data = structured_data(result)
+        except Exception:
+            data = {
+                "success": not has_error,
+                "can_continue": has_more_steps,
+                "notes": "",
+                "extracted_info": "",
+            }
 
     log_entry = {
         "node": "validation",
@@ -355,42 +888,34 @@ Respond in JSON:
     }
 
     return {
-        **state,
-        "step_log": state.get("step_log", []) + [log_entry],
+        "step_log": [log_entry],
         # Store validation for the router decision
         "_validation": data,
     }
 
 
 
-def completion(state: AgentState) -> AgentState:
+async def completion(state: AgentState) -> dict:
     """
-    Node 5: Synthesizes all results and produces the final user response.
+    Node 4: Synthesizes all results and produces the final user response.
+    The answer is streamed so the UI can render tokens as they are decoded.
     """
     history = state.get("results_history", [])
     history_text = "\n".join(
-        [f"Step {item['step']} ({item['action']}): {str(item['result'])[:300]}" for item in history]
+        [f"Step {item['step']} ({item['action']}): {item['result_summary']}" for item in history]
     )
 
-    prompt = f"""You are a web agent that just completed a task.
-
-Original task: "{state['user_input']}"
-Intent: "{state.get('intent', '')}"
-
-Execution history:
-{history_text}
-
-Generate a clear and objective summary of what was done, including:
-- What was completed successfully
-- Results obtained
-- Whether the task is complete or needs human intervention
-- Suggested next steps (if applicable)
-
-Respond in concise and useful English."""
+    prompt = _COMPLETION_PROMPT.format(
+        user_input=state["user_input"],
+        intent=state.get("intent", ""),
+        history_text=history_text,
+    )
 
     try:
-        response = llm.invoke([HumanMessage(content=prompt)])
-        final_answer = response.content
+        chunks = []
+        async for chunk in _LLM_COMPLETE.astream([HumanMessage(content=prompt)]):
+            chunks.append(chunk.content)
+        final_answer = "".join(chunks)
     except Exception:
         final_answer = (
             f"Task executed with {len(history)} steps. "
@@ -403,9 +928,8 @@ Respond in concise and useful English."""
     }
 
     return {
-        **state,
         "final_answer": final_answer,
-        "step_log": state.get("step_log", []) + [log_entry],
+        "step_log": [log_entry],
     }
 
 
@@ -429,40 +953,95 @@ def should_continue(state: AgentState) -> str:
     return "tool_execution"
 
 
+# Node cache keys
+
+NODE_CACHE_TTL_SECONDS = 3600
+
+
+
+def _hash_key(*parts: Any) -> str:
+    """Builds a stable SHA-256 cache key from the given values."""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+
+def intent_and_plan_cache_key(state: AgentState) -> str:
+    """intent_and_plan depends only on the user request."""
+    return _hash_key(state.get("user_input", ""))
+
+
+
+def validation_cache_key(state: AgentState) -> str:
+    """
+    validation depends on the full last result (error keywords are searched
+    beyond the trimmed prompt text) and plan progress, so equal keys always
+    build the same prompt.
+    """
+    return _hash_key(
+        state.get("last_result", ""),
+        state.get("current_step", 0),
+        len(state.get("plan", [])),
+    )
+
+
 # Graph construction
 
+# SQLite file holding per-thread checkpoints
+CHECKPOINT_DB_PATH = os.environ.get("CHECKPOINT_DB_PATH", "agent_state.db")
+
 
-def build_graph() -> StateGraph:
+def build_graph(checkpointer: Optional[AsyncSqliteSaver] = None) -> StateGraph:
     """Builds and compiles the LangGraph workflow."""
     graph = StateGraph(AgentState)
 
     # Add nodes
-    graph.add_node("intent_analysis", intent_analysis)
-    graph.add_node("plan_generation", plan_generation)
+    graph.add_node(
+        "intent_and_plan",
+        intent_and_plan,
+        cache_policy=CachePolicy(
+            key_func=intent_and_plan_cache_key, ttl=NODE_CACHE_TTL_SECONDS
+        ),
+    )
     graph.add_node("tool_execution", tool_execution)
-    graph.add_node("validation", validation)
+    graph.add_node(
+        "validation",
+        validation,
+        cache_policy=CachePolicy(
+            key_func=validation_cache_key, ttl=NODE_CACHE_TTL_SECONDS
+        ),
+    )
     graph.add_node("completion", completion)
 
-    # Initial linear flow
-    graph.set_entry_point("intent_analysis")
-    graph.add_edge("intent_analysis", "plan_generation")
-    graph.add_edge("plan_generation", "tool_execution")
+    # Linear flow
+    graph.set_entry_point("intent_and_plan")
     graph.add_edge("tool_execution", "validation")
 
     # Conditional flow: continue or finish
-    graph.add_conditional_edges(
-        "validation",
-        should_continue,
-        {
-            "tool_execution": "tool_execution",
-            "completion": "completion",
-        },
-    )
+    for source in ("intent_and_plan", "validation"):
+        graph.add_conditional_edges(
+            source,
+            should_continue,
+            ["tool_execution", "completion"],
+        )
 
     graph.add_edge("completion", END)
 
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer, cache=InMemoryCache())
+
+
+# Compiled graph instance (singleton, created on the running event loop)
+_agent_graph = None
+
 
 
-# Compiled graph instance (singleton)
-agent_graph = build_graph()
+async def get_agent_graph():
+    """Returns the compiled graph backed by the SQLite checkpointer."""
+    global _agent_graph
+    if _agent_graph is None:
+        conn = await aiosqlite.connect(CHECKPOINT_DB_PATH)
+        if _agent_graph is None:
+            _agent_graph = build_graph(AsyncSqliteSaver(conn))
+        else:
+            await conn.close()
+    return _agent_graph
@@ -0,0 +1,115 @@
+"""
+i18n.py - User-facing strings of the Chainlit interface.
+
+The locale is chosen with the APP_LOCALE environment variable ("en" or
+"pt"); unknown locales fall back to English.
+"""
+
+import os
+
+_LABELS = {
+    "en": {
+        "intent_analysis": "Intent Analysis",
+        "plan_generation": "Plan Generation",
+        "tool_execution": "Tool Execution",
+        "validation": "Result Validation",
+        "completion": "Completion",
+    },
+    "pt": {
+        "intent_analysis": "Análise de Intenção",
+        "plan_generation": "Geração do Plano",
+        "tool_execution": "Execução de Ferramenta",
+        "validation": "Validação do Resultado",
+        "completion": "Conclusão",
+    },
+}
+
+_MESSAGES = {
+    "en": {
+        "welcome": (
+            "**Autonomous Web Agent started**\n\n"
+            "I can browse the web, click elements, fill forms, and more.\n\n"
+            "**Example requests:**\n"
+            "- *Open YouTube and play a random video*\n"
+            "- *Search Airbnb apartments in Sao Paulo*\n"
+            "- *Open BBC and read the top headline*\n\n"
+            "Initializing browser..."
+        ),
+        "browser_ready": "Browser ready. Type your request.",
+        "processing": "Processing: *{user_input}*\n\nStarting agent pipeline...",
+        "step_name": "Step {step}: {action}",
+        "final_result": "---\n### Final Result\n\n",
+        "task_completed": "Task completed.",
+        "actions_executed": "*{count} action(s) executed.*",
+        "critical_error": "Critical execution error: {error}",
+        "retry": "Retry",
+        "resuming": "Resuming from the last completed step...",
+        # Step log formatting
+        "not_available": "N/A",
+        "identified_intent": "**Identified Intent:**",
+        "target_domain": "**Target Domain:**",
+        "main_action": "**Main Action:**",
+        "semantic_constraints": "**Semantic Constraints:**",
+        "generated_plan": "**Generated plan with {count} step(s):**",
+        "plan_input": "_Input:_",
+        "step_label": "**Step {step}:**",
+        "input": "**Input:**",
+        "result": "**Result:**",
+        "status": "**Status:**",
+        "status_success": "Success",
+        "status_issue": "Issue",
+        "can_continue": "**Can Continue:**",
+        "yes": "Yes",
+        "no": "No",
+        "notes": "**Notes:**",
+        "extracted_info": "**Extracted Info:**",
+        "completed": "Completed.",
+    },
+    "pt": {
+        "welcome": (
+            "**Agente Web Autônomo iniciado**\n\n"
+            "Posso navegar na web, clicar em elementos, preencher formulários e mais.\n\n"
+            "**Exemplos de pedidos:**\n"
+            "- *Abra o YouTube e toque um vídeo aleatório*\n"
+            "- *Busque apartamentos no Airbnb em São Paulo*\n"
+            "- *Abra a BBC e leia a manchete principal*\n\n"
+            "Inicializando o navegador..."
+        ),
+        "browser_ready": "Navegador pronto. Digite seu pedido.",
+        "processing": "Processando: *{user_input}*\n\nIniciando o pipeline do agente...",
+        "step_name": "Passo {step}: {action}",
+        "final_result": "---\n### Resultado Final\n\n",
+        "task_completed": "Tarefa concluída.",
+        "actions_executed": "*{count} ação(ões) executada(s).*",
+        "critical_error": "Erro crítico de execução: {error}",
+        "retry": "Tentar novamente",
+        "resuming": "Retomando a partir do último passo concluído...",
+        # Step log formatting
+        "not_available": "N/D",
+        "identified_intent": "**Intenção Identificada:**",
+        "target_domain": "**Domínio Alvo:**",
+        "main_action": "**Ação Principal:**",
+        "semantic_constraints": "**Restrições Semânticas:**",
+        "generated_plan": "**Plano gerado com {count} passo(s):**",
+        "plan_input": "_Entrada:_",
+        "step_label": "**Passo {step}:**",
+        "input": "**Entrada:**",
+        "result": "**Resultado:**",
+        "status": "**Status:**",
+        "status_success": "Sucesso",
+        "status_issue": "Problema",
+        "can_continue": "**Pode Continuar:**",
+        "yes": "Sim",
+        "no": "Não",
+        "notes": "**Observações:**",
+        "extracted_info": "**Informação Extraída:**",
+        "completed": "Concluído.",
+    },
+}
+
+LOCALE = os.environ.get("APP_LOCALE", "en")
+if LOCALE not in _MESSAGES:
+    LOCALE = "en"
+
+NODE_LABELS = _LABELS[LOCALE]
+MESSAGES = _MESSAGES[LOCALE]
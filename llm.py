@@ -2,23 +2,184 @@
 llm.py - Language model configuration (Llama 3.2:3b via Ollama).
 """
 
-from langchain_ollama import ChatOllama
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
 
+import httpx
+import ollama
+from langchain_core.runnables import Runnable
+from langchain_ollama import ChatOllama, OllamaEmbeddings
+from pydantic import BaseModel
 
+MODEL_NAME = "llama3.2:3b"
+EMBEDDING_MODEL_NAME = "nomic-embed-text"
 
-def get_llm(temperature: float = 0.2, max_tokens: int = 2048) -> ChatOllama:
+# Keep model weights resident in Ollama between requests
+KEEP_ALIVE = "30m"
+
+# Options for the HTTP client ChatOllama keeps open to the Ollama server
+CLIENT_KWARGS = {
+    "limits": httpx.Limits(max_keepalive_connections=8),
+}
+
+# Response cache settings (only near-deterministic calls are cached)
+CACHE_MAX_TEMPERATURE = 0.2
+CACHE_MAX_ENTRIES = 512
+CACHE_TTL_SECONDS = 3600
+
+# key -> (stored_at, response)
+_response_cache: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+
+
+class CachedChatOllama(ChatOllama):
+    """
+    ChatOllama with an in-memory LRU cache in front of invoke().
+
+    Identical prompts sent with a low temperature return the stored response
+    instead of paying for a new Ollama decode.
+    """
+
+    def _cache_key(self, input: Any, kwargs: dict) -> Optional[str]:
+        """Returns the SHA-256 cache key, or None when the call is not cacheable."""
+        if self.temperature is None or self.temperature > CACHE_MAX_TEMPERATURE:
+            return None
+
+        messages = input if isinstance(input, list) else [input]
+        payload = {
+            "model": self.model,
+            "temp": self.temperature,
+            "num_predict": self.num_predict,
+            "format": self.format,
+            "msgs": [str(getattr(message, "content", message)) for message in messages],
+            "kwargs": kwargs,
+        }
+        raw = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: Optional[str]) -> Any:
+        """Returns a fresh cached response for the key, or None."""
+        if key is None:
+            return None
+        cached = _response_cache.get(key)
+        if cached and time.monotonic() - cached[0] < CACHE_TTL_SECONDS:
+            _response_cache.move_to_end(key)
+            return cached[1]
+        return None
+
+    def _cache_put(self, key: Optional[str], response: Any) -> None:
+        """Stores a response, evicting the least recently used entries."""
+        if key is None:
+            return
+        _response_cache[key] = (time.monotonic(), response)
+        _response_cache.move_to_end(key)
+        while len(_response_cache) > CACHE_MAX_ENTRIES:
+            _response_cache.popitem(last=False)
+
+    def invoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Any:
+        key = self._cache_key(input, kwargs)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        response = super().invoke(input, config, **kwargs)
+        self._cache_put(key, response)
+        return response
+
+    async def ainvoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Any:
+        key = self._cache_key(input, kwargs)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        response = await super().ainvoke(input, config, **kwargs)
+        self._cache_put(key, response)
+        return response
+
+
+
+@functools.lru_cache(maxsize=None)
+def get_llm(
+    temperature: float = 0.2, max_tokens: int = 2048, json_mode: bool = False
+) -> ChatOllama:
     """
     Returns a configured Llama 3.2:3b instance via Ollama.
 
+    Instances are shared per (temperature, max_tokens, json_mode) combination.
+    Calls made with temperature <= CACHE_MAX_TEMPERATURE are served from an
+    in-memory response cache when the same prompt was already answered.
+
     Args:
         temperature: Creativity control (lower = more deterministic)
         max_tokens: Maximum response tokens
+        json_mode: Constrain decoding to valid JSON (Ollama format="json")
 
     Returns:
         Configured ChatOllama instance
     """
-    return ChatOllama(
-        model="llama3.2:3b",
+    return CachedChatOllama(
+        model=MODEL_NAME,
         temperature=temperature,
         num_predict=max_tokens,
+        format="json" if json_mode else None,
+        keep_alive=KEEP_ALIVE,
+        client_kwargs=CLIENT_KWARGS,
+    )
+
+
+
+@functools.lru_cache(maxsize=None)
+def get_llm_json(
+    schema: type[BaseModel], temperature: float = 0.2, max_tokens: int = 2048
+) -> Runnable:
+    """
+    Returns a Llama 3.2:3b runnable constrained to a Pydantic schema.
+
+    Ollama enforces the schema's JSON grammar while decoding. The runnable
+    returns {"raw": AIMessage, "parsed": schema | None, "parsing_error": ...}
+    so callers can fall back to the raw text when parsing fails.
+
+    Args:
+        schema: Pydantic model describing the expected output
+        temperature: Creativity control (lower = more deterministic)
+        max_tokens: Maximum response tokens
+
+    Returns:
+        Runnable producing raw and parsed outputs
+    """
+    return get_llm(temperature, max_tokens, json_mode=True).with_structured_output(
+        schema, method="json_schema", include_raw=True
     )
+
+
+
+@functools.lru_cache(maxsize=None)
+def get_embeddings() -> OllamaEmbeddings:
+    """
+    Returns the embedding model used for semantic cache lookups.
+
+    The instance is shared, so its HTTP client stays open between calls.
+
+    Returns:
+        Configured OllamaEmbeddings instance
+    """
+    return OllamaEmbeddings(model=EMBEDDING_MODEL_NAME, client_kwargs=CLIENT_KWARGS)
+
+
+
+def warm_up_model() -> None:
+    """Loads the model into Ollama memory so the first request skips the cold start."""
+    try:
+        ollama.Client(**CLIENT_KWARGS).generate(
+            model=MODEL_NAME, prompt="", keep_alive=KEEP_ALIVE
+        )
+    except Exception:
+        pass
+
+
+# Warm up in the background so importing this module never blocks
+threading.Thread(target=warm_up_model, daemon=True).start()
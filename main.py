@@ -5,11 +5,34 @@ Enables LangSmith tracing and connects the LangGraph workflow to chat.
 """
 
 import asyncio
+import os
+import sys
+from typing import Optional
 
 import chainlit as cl
 
-from graph import AgentState, agent_graph
-from tools import close_browser, init_browser
+from graph import AgentState, get_agent_graph
+from i18n import MESSAGES, NODE_LABELS
+from tools import (
+    close_browser,
+    close_browser_session,
+    init_browser,
+    prewarm_http_pool,
+    set_browser_session,
+)
+
+# Opt-in uvloop event loop (POSIX only). Chainlit deliberately runs on the
+# stock asyncio loop, so this overrides its choice; the policy is set before
+# Chainlit calls asyncio.run.
+UVLOOP_ENABLED = os.environ.get("UVLOOP_ENABLED", "0") == "1"
+
+if UVLOOP_ENABLED and sys.platform != "win32":
+    try:
+        import uvloop
+
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
 
 # LangSmith tracing
 
@@ -23,80 +46,108 @@ NODE_ICONS = {
     "completion": "[C]",
 }
 
-NODE_LABELS = {
-    "intent_analysis": "Intent Analysis",
-    "plan_generation": "Plan Generation",
-    "tool_execution": "Tool Execution",
-    "validation": "Result Validation",
-    "completion": "Completion",
+# (icon, label) per node, resolved with a single lookup when rendering
+NODE_META = {node: (NODE_ICONS[node], NODE_LABELS[node]) for node in NODE_ICONS}
+
+# Immutable defaults of the agent state; mutable fields are created per request
+_INITIAL_STATE_TEMPLATE: AgentState = {
+    "user_input": "",
+    "intent": "",
+    "current_step": 0,
+    "last_result": "",
+    "final_answer": "",
+    "error": "",
 }
 
 # Log formatting for Chainlit
 
 
+def _format_intent_analysis(entry: dict) -> str:
+    details = entry.get("details", {})
+    not_available = MESSAGES["not_available"]
+    lines = [
+        f"{MESSAGES['identified_intent']} {entry.get('intent', '')}",
+        f"{MESSAGES['target_domain']} {details.get('target_domain', not_available)}",
+        f"{MESSAGES['main_action']} {details.get('main_action', not_available)}",
+    ]
+    constraints = details.get("semantic_constraints", [])
+    if constraints:
+        lines.append(MESSAGES["semantic_constraints"])
+        lines.extend(f"  - {constraint}" for constraint in constraints)
+    return "\n".join(lines)
+
+
+def _format_plan_generation(entry: dict) -> str:
+    plan = entry.get("plan", [])
+    lines = [MESSAGES["generated_plan"].format(count=len(plan)) + "\n"]
+    for step, input_preview in zip(plan, entry.get("input_previews", [])):
+        lines.append(
+            f"**{step.get('step', '?')}.** `{step.get('action', '')}` - {step.get('description', '')}"
+        )
+        if input_preview:
+            lines.append(f"   {MESSAGES['plan_input']} `{input_preview}`")
+    return "\n".join(lines)
+
+
+def _format_tool_execution(entry: dict) -> str:
+    return (
+        f"{MESSAGES['step_label'].format(step=entry.get('step', '?'))} `{entry.get('action', '')}`\n"
+        f"{MESSAGES['input']} `{entry.get('input_preview', '')}`\n\n"
+        f"{MESSAGES['result']}\n```\n{entry.get('result_preview', '')}\n```"
+    )
+
+
+def _format_validation(entry: dict) -> str:
+    validation_data = entry.get("validation", {})
+    status = MESSAGES["status_success"] if validation_data.get("success") else MESSAGES["status_issue"]
+    can_continue = MESSAGES["yes"] if validation_data.get("can_continue") else MESSAGES["no"]
+    lines = [
+        f"{MESSAGES['status']} {status}",
+        f"{MESSAGES['can_continue']} {can_continue}",
+    ]
+    notes = validation_data.get("notes", "")
+    if notes:
+        lines.append(f"{MESSAGES['notes']} {notes}")
+    extracted_info = validation_data.get("extracted_info", "")
+    if extracted_info:
+        lines.append(f"{MESSAGES['extracted_info']} {extracted_info}")
+    return "\n".join(lines)
+
+
+def _format_completion(entry: dict) -> str:
+    return entry.get("final_answer", MESSAGES["completed"])
+
+
+# Node -> formatter dispatch table
+_LOG_FORMATTERS = {
+    "intent_analysis": _format_intent_analysis,
+    "plan_generation": _format_plan_generation,
+    "tool_execution": _format_tool_execution,
+    "validation": _format_validation,
+    "completion": _format_completion,
+}
+
+
 def format_log_entry(entry: dict) -> str:
     """Formats a log entry for Chainlit display."""
-    node = entry.get("node", "")
-
-    if node == "intent_analysis":
-        details = entry.get("details", {})
-        lines = [
-            f"**Identified Intent:** {entry.get('intent', '')}",
-            f"**Target Domain:** {details.get('target_domain', 'N/A')}",
-            f"**Main Action:** {details.get('main_action', 'N/A')}",
-        ]
-        constraints = details.get("semantic_constraints", [])
-        if constraints:
-            lines.append("**Semantic Constraints:**")
-            for constraint in constraints:
-                lines.append(f"  - {constraint}")
-        return "\n".join(lines)
-
-    if node == "plan_generation":
-        plan = entry.get("plan", [])
-        lines = [f"**Generated plan with {len(plan)} step(s):**\n"]
-        for step in plan:
-            step_number = step.get("step", "?")
-            action = step.get("action", "")
-            description = step.get("description", "")
-            step_input = step.get("input", "")
-            lines.append(f"**{step_number}.** `{action}` - {description}")
-            if step_input:
-                input_preview = str(step_input)[:100]
-                lines.append(f"   _Input:_ `{input_preview}`")
-        return "\n".join(lines)
+    return _LOG_FORMATTERS.get(entry.get("node", ""), str)(entry)
+
+
+async def send_log_step(entry: dict) -> None:
+    """Renders a single log entry as a Chainlit step."""
+    node = entry.get("node", "unknown")
+    icon, label = NODE_META.get(node, ("[>]", node))
+    content = format_log_entry(entry)
 
+    # For tool_execution, create one step per tool call
+    step_name = f"{icon} {label}"
     if node == "tool_execution":
         step_number = entry.get("step", "?")
         action = entry.get("action", "")
-        step_input = str(entry.get("input", ""))[:150]
-        result = str(entry.get("result", ""))[:400]
-        return (
-            f"**Step {step_number}:** `{action}`\n"
-            f"**Input:** `{step_input}`\n\n"
-            f"**Result:**\n```\n{result}\n```"
-        )
-
-    if node == "validation":
-        validation_data = entry.get("validation", {})
-        success_text = "Success" if validation_data.get("success") else "Issue"
-        can_continue_text = "Yes" if validation_data.get("can_continue") else "No"
-        notes = validation_data.get("notes", "")
-        extracted_info = validation_data.get("extracted_info", "")
-        lines = [
-            f"**Status:** {success_text}",
-            f"**Can Continue:** {can_continue_text}",
-        ]
-        if notes:
-            lines.append(f"**Notes:** {notes}")
-        if extracted_info:
-            lines.append(f"**Extracted Info:** {extracted_info}")
-        return "\n".join(lines)
-
-    if node == "completion":
-        return entry.get("final_answer", "Completed.")
+        step_name = f"{icon} " + MESSAGES["step_name"].format(step=step_number, action=action)
 
-    return str(entry)
+    async with cl.Step(name=step_name) as step:
+        step.output = content
 
 
 # Chainlit handlers
@@ -105,110 +156,146 @@ def format_log_entry(entry: dict) -> str:
 @cl.on_chat_start
 async def on_start():
     """Initializes the browser when chat starts."""
-    await cl.Message(
-        content=(
-            "**Autonomous Web Agent started**\n\n"
-            "I can browse the web, click elements, fill forms, and more.\n\n"
-            "**Example requests:**\n"
-            "- *Open YouTube and play a random video*\n"
-            "- *Search Airbnb apartments in Sao Paulo*\n"
-            "- *Open BBC and read the top headline*\n\n"
-            "Initializing browser..."
-        )
-    ).send()
+    await cl.Message(content=MESSAGES["welcome"]).send()
 
-    # Initialize browser (headless=False to watch execution)
-    loop = asyncio.get_event_loop()
-    await loop.run_in_executor(None, lambda: init_browser(headless=False))
+    # Initialize browser (headless=False to watch execution); the search
+    # connections are opened meanwhile when prewarming is enabled
+    await asyncio.gather(init_browser(headless=False), prewarm_http_pool())
 
-    await cl.Message(content="Browser ready. Type your request.").send()
+    await cl.Message(content=MESSAGES["browser_ready"]).send()
 
 
 @cl.on_chat_end
 async def on_end():
-    """Closes the browser when chat ends."""
+    """Closes the session's pages and drops its retryable checkpoints when chat ends."""
     try:
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, close_browser)
+        await close_browser_session(cl.user_session.get("id", ""))
     except Exception:
         pass
 
+    agent_graph = await get_agent_graph()
+    for thread_id in cl.user_session.get("failed_threads", []):
+        await agent_graph.checkpointer.adelete_thread(thread_id)
+
+
+@cl.on_app_shutdown
+async def on_shutdown():
+    """Closes the shared browser and HTTP client when the server stops."""
+    await close_browser()
+
+
+async def run_agent(graph_input: Optional[AgentState], config: dict) -> None:
+    """
+    Streams the graph for one run and renders its steps and final answer.
+
+    graph_input=None resumes the run stored under config's thread_id from
+    its last checkpoint. On failure a Retry action is offered that resumes
+    the same thread, so completed steps are not executed again. Checkpoints
+    of a successful run are deleted; failed threads are kept until retried
+    or until the chat ends.
+    """
+    agent_graph = await get_agent_graph()
+    thread_id = config["configurable"]["thread_id"]
+    failed_threads = cl.user_session.get("failed_threads", [])
+
+    # Stream the graph: render steps as nodes finish and the final answer as it decodes
+    answer_msg = cl.Message(content="")
+    streamed_answer = False
+    final_state: dict = {}
+
+    try:
+        async for mode, payload in agent_graph.astream(
+            graph_input, config=config, stream_mode=["updates", "messages", "values"]
+        ):
+            if mode == "messages":
+                chunk, metadata = payload
+                if metadata.get("langgraph_node") == "completion" and chunk.content:
+                    if not streamed_answer:
+                        await answer_msg.stream_token(MESSAGES["final_result"])
+                        streamed_answer = True
+                    await answer_msg.stream_token(chunk.content)
+            elif mode == "updates":
+                for node, update in payload.items():
+                    if node.startswith("__") or not isinstance(update, dict):
+                        continue
+                    for entry in update.get("step_log", []):
+                        # The final answer is shown in its own message
+                        if entry.get("node") != "completion":
+                            await send_log_step(entry)
+            else:
+                final_state = payload
+    except Exception as exc:
+        if thread_id not in failed_threads:
+            cl.user_session.set("failed_threads", failed_threads + [thread_id])
+        await cl.Message(
+            content=MESSAGES["critical_error"].format(error=exc),
+            actions=[
+                cl.Action(
+                    name="retry_run",
+                    payload={"thread_id": thread_id},
+                    label=MESSAGES["retry"],
+                )
+            ],
+        ).send()
+        return
+
+    # The run finished: its checkpoints are no longer needed
+    await agent_graph.checkpointer.adelete_thread(thread_id)
+    if thread_id in failed_threads:
+        cl.user_session.set("failed_threads", [t for t in failed_threads if t != thread_id])
+
+    # Final response
+    final_answer = final_state.get("final_answer", MESSAGES["task_completed"])
+    total_steps = len(final_state.get("results_history", []))
+
+    footer = MESSAGES["actions_executed"].format(count=total_steps)
+    if streamed_answer:
+        await answer_msg.stream_token(f"\n\n{footer}")
+    else:
+        answer_msg.content = f"{MESSAGES['final_result']}{final_answer}\n\n{footer}"
+    await answer_msg.send()
+
 
 @cl.on_message
 async def on_message(message: cl.Message):
     """
-    Main handler: receives user input, runs the graph,
-    and displays each step using cl.Step().
+    Main handler: receives user input, streams the graph,
+    and displays each step using cl.Step() as it completes.
     """
     user_input = message.content.strip()
     if not user_input:
         return
 
+    session_id = cl.user_session.get("id", "")
+
     # Initial agent state
-    initial_state: AgentState = {
+    initial_state: AgentState = _INITIAL_STATE_TEMPLATE | {
         "user_input": user_input,
-        "intent": "",
         "plan": [],
-        "current_step": 0,
-        "last_result": "",
         "results_history": [],
-        "final_answer": "",
-        "error": "",
         "step_log": [],
         "_validation": {},
     }
 
-    # Start message
-    await cl.Message(
-        content=f"Processing: *{user_input}*\n\nStarting agent pipeline..."
-    ).send()
-
-    # Run graph synchronously in a separate thread
-    loop = asyncio.get_event_loop()
+    # One checkpoint thread per request, so list reducers never carry over
+    config = {"configurable": {"thread_id": f"{session_id}:{message.id}"}}
 
-    def run_graph():
-        return agent_graph.invoke(initial_state)
+    # Browser tools called from this run act on this session's pages
+    set_browser_session(session_id)
 
-    try:
-        final_state = await loop.run_in_executor(None, run_graph)
-    except Exception as exc:
-        await cl.Message(content=f"Critical execution error: {exc}").send()
-        return
-
-    # Show each step using cl.Step()
-    step_log = final_state.get("step_log", [])
-
-    for entry in step_log:
-        node = entry.get("node", "unknown")
-        icon = NODE_ICONS.get(node, "[>]")
-        label = NODE_LABELS.get(node, node)
-        content = format_log_entry(entry)
-
-        # For tool_execution, create one step per tool call
-        step_name = f"{icon} {label}"
-        if node == "tool_execution":
-            step_number = entry.get("step", "?")
-            action = entry.get("action", "")
-            step_name = f"{icon} Step {step_number}: {action}"
+    # Start message
+    await cl.Message(content=MESSAGES["processing"].format(user_input=user_input)).send()
 
-        async with cl.Step(name=step_name) as step:
-            step.output = content
+    await run_agent(initial_state, config)
 
-        # Small pause for better UX
-        await asyncio.sleep(0.1)
 
-    # Final response
-    final_answer = final_state.get("final_answer", "Task completed.")
-    total_steps = len(final_state.get("results_history", []))
-
-    await cl.Message(
-        content=(
-            "---\n"
-            "### Final Result\n\n"
-            f"{final_answer}\n\n"
-            f"*{total_steps} action(s) executed.*"
-        )
-    ).send()
+@cl.action_callback("retry_run")
+async def on_retry(action: cl.Action):
+    """Resumes a failed run from its last checkpoint."""
+    await action.remove()
+    set_browser_session(cl.user_session.get("id", ""))
+    await cl.Message(content=MESSAGES["resuming"]).send()
+    await run_agent(None, {"configurable": {"thread_id": action.payload["thread_id"]}})
 
 
 # Direct entry point
@@ -2,66 +2,428 @@
 tools.py - Browser automation and web search tools.
 
 Each tool uses LangChain's @tool decorator and has a clear docstring.
+Browser tools are coroutines built on Playwright's async API, so they run
+directly on the event loop without a worker thread.
 The browser instance is shared through global state to keep session context.
 """
 
-import json
+import asyncio
+import os
 import time
+from collections import OrderedDict
+from contextvars import ContextVar
 from typing import Optional
+from urllib.parse import quote_plus, urlparse
 
+import httpx
+import orjson
 from langchain_core.tools import tool
-from playwright.sync_api import Browser, Page, Playwright, sync_playwright
+from lxml import etree
+from lxml import html as lxml_html
+from playwright.async_api import (
+    BrowserContext,
+    Page,
+    Playwright,
+    async_playwright,
+)
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+
+_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+
+# Ad and tracker hosts, resolved to "not found" by Chromium itself
+_AD_HOSTS = (
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "adnxs.com",
+    "criteo.com",
+    "taboola.com",
+    "outbrain.com",
+    "scorecardresearch.com",
+    "amazon-adsystem.com",
+)
+
+# Chromium flags that keep pages light: the agent reads the DOM, not pixels.
+# Blocking happens inside the browser rather than through page.route, which
+# would disable the HTTP cache and send every request through Python.
+# Stylesheets are kept because element visibility depends on layout.
+_LIGHTWEIGHT_BROWSER_ARGS = [
+    "--blink-settings=imagesEnabled=false",
+    "--autoplay-policy=user-gesture-required",
+    "--host-resolver-rules="
+    + ", ".join(f"MAP {host} ~NOTFOUND, MAP *.{host} ~NOTFOUND" for host in _AD_HOSTS),
+]
+
+# DuckDuckGo endpoints (query is filled in with quote_plus). The Instant
+# Answer API is tried first; the HTML results page is the fallback.
+_DDG_API_URL = "https://api.duckduckgo.com/?q={}&format=json&no_html=1&skip_disambig=1"
+_DDG_URL = "https://html.duckduckgo.com/html/?q={}"
+SEARCH_MAX_RESULTS = 8
+
+# The Instant Answer API is an optional first try; keep its wait short
+INSTANT_ANSWER_TIMEOUT_SECONDS = 2.0
+
+# Answers with fewer entries (official site + abstract) are topped up with
+# organic results from the HTML page
+INSTANT_ANSWER_MIN_RESULTS = 3
+
+# The result blocks sit at the top of the page; stop reading after this much
+SEARCH_MAX_HTML_BYTES = 200_000
+
+# DuckDuckGo HTML result selectors (compiled once); matches a whole class token
+_HAS_CLASS = "contains(concat(' ', normalize-space(@class), ' '), ' {} ')"
+_RESULT_XPATH = etree.XPath(f"//div[{_HAS_CLASS.format('result')}]")
+_TITLE_XPATH = etree.XPath(f".//*[{_HAS_CLASS.format('result__title')}]//text()")
+_URL_XPATH = etree.XPath(f".//*[{_HAS_CLASS.format('result__url')}]//text()")
+_SNIPPET_XPATH = etree.XPath(f".//*[{_HAS_CLASS.format('result__snippet')}]//text()")
+
+# search_web response cache: normalized query -> (stored_at, results JSON)
+SEARCH_CACHE_MAX_ENTRIES = 256
+SEARCH_CACHE_TTL_SECONDS = 300
+_search_cache: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+
+# Element extraction helper, installed on every page by init_browser.
+# One compound querySelectorAll (matched natively, in document order, without
+# duplicates); fields come back as parallel arrays to keep the CDP payload
+# small, and extract_page_elements zips them back into records.
+_INTERACTIVE_SELECTOR = 'a,button,input,select,textarea,[role="button"],[onclick]'
+
+_EXTRACT_ELEMENTS_JS = """
+(() => {
+const INTERACTIVE_SELECTOR = '%s';
+
+window.__extractElements = (maxN) => {
+    // Pass 1: geometry only. No DOM writes happen in between, so layout is
+    // computed at most once for all the rect reads.
+    const visible = [];
+    for (const el of document.querySelectorAll(INTERACTIVE_SELECTOR)) {
+        const rect = el.getBoundingClientRect();
+        if (rect.width === 0 || rect.height === 0) continue;
+        visible.push(el);
+        if (visible.length >= maxN) break;
+    }
+
+    // Pass 2: attributes and text of the visible elements
+    const tags = [], types = [], texts = [], hrefs = [], hints = [], ids = [], classes = [];
+    const hintCache = new Map();
+    for (const el of visible) {
+        const tag = el.tagName.toLowerCase();
+        const cls = typeof el.className === 'string' ? el.className : '';
+        const id = el.id || '';
+
+        // Representative CSS selector hint, built once per (tag, id, class)
+        const key = `${tag}|${id}|${cls}`;
+        let hint = hintCache.get(key);
+        if (hint === undefined) {
+            if (id) hint = `#${id}`;
+            else if (cls) hint = `${tag}.${cls.split(' ')[0]}`;
+            else hint = tag;
+            hintCache.set(key, hint);
+        }
 
-# Global browser state
+        tags.push(tag);
+        types.push(el.type || '');
+        texts.push((el.innerText || el.value || el.placeholder || el.getAttribute('aria-label') || '').trim().slice(0, 80));
+        hrefs.push(el.href || '');
+        hints.push(hint);
+        ids.push(id);
+        classes.push(cls.slice(0, 60));
+    }
+    return { tags, types, texts, hrefs, hints, ids, classes };
+};
+})();
+""" % _INTERACTIVE_SELECTOR
+
+_CALL_EXTRACT_ELEMENTS_JS = (
+    "(maxN) => window.__extractElements ? window.__extractElements(maxN) : null"
+)
+
+# Open the search connections while the browser starts (SURVEY_AGENT_PREWARM=1)
+PREWARM_ENABLED = os.environ.get("SURVEY_AGENT_PREWARM", "0") == "1"
+
+# Chromium user data directory reused across runs
+BROWSER_PROFILE_DIR = os.environ.get("BROWSER_PROFILE_DIR", ".pw_profile")
+
+# Global browser state (_page is the first page, used by the default session)
 _playwright: Optional[Playwright] = None
-_browser: Optional[Browser] = None
+_context: Optional[BrowserContext] = None
 _page: Optional[Page] = None
 
+# Serializes browser start-up: the persistent profile can only be opened once
+_init_lock = asyncio.Lock()
 
+# Browser session of the current task; each chat session drives its own
+# pages so concurrent runs never navigate each other's page
+_browser_session: ContextVar[str] = ContextVar("browser_session", default="")
 
-def init_browser(headless: bool = False) -> Page:
-    """Initializes Playwright and opens a controlled page."""
-    global _playwright, _browser, _page
-    if _page is None:
-        _playwright = sync_playwright().start()
-        _browser = _playwright.chromium.launch(headless=headless)
-        context = _browser.new_context(
-            viewport={"width": 1280, "height": 800},
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
-            ),
-        )
-        _page = context.new_page()
+# Page the tools act on, per browser session
+_active_pages: dict[str, Page] = {}
+
+# Open pages keyed by (session, origin), so revisiting a site reuses its warm page;
+# the cap applies per session
+MAX_ORIGIN_PAGES = 5
+_origin_pages: "OrderedDict[tuple[str, str], Page]" = OrderedDict()
+
+# Shared HTTP client for search requests (created lazily, reused across calls)
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+
+async def init_browser(headless: bool = False, block_resources: bool = True) -> Page:
+    """
+    Initializes Playwright and opens a controlled page.
+
+    With block_resources (the default) the browser skips images, does not
+    autoplay media and cannot reach ad/tracker hosts; disable it for visual
+    tasks.
+    """
+    global _playwright, _context, _page
+    if _page is not None:
+        return _page
+    async with _init_lock:
+        # Another chat may have started the browser while this one waited
+        if _page is None:
+            _playwright = await async_playwright().start()
+            # Persistent profile: cookies, logins and the HTTP cache survive restarts
+            _context = await _playwright.chromium.launch_persistent_context(
+                BROWSER_PROFILE_DIR,
+                headless=headless,
+                viewport={"width": 1280, "height": 800},
+                user_agent=_USER_AGENT,
+                args=_LIGHTWEIGHT_BROWSER_ARGS if block_resources else [],
+            )
+            await _context.add_init_script(script=_EXTRACT_ELEMENTS_JS)
+            _page = _context.pages[0] if _context.pages else await _context.new_page()
     return _page
 
 
 
-def close_browser() -> None:
-    """Closes the browser and releases resources."""
-    global _playwright, _browser, _page
-    if _browser:
-        _browser.close()
+async def close_browser() -> None:
+    """
+    Closes the browser and the shared HTTP client, releasing resources.
+
+    This ends every chat session's pages; call it on process shutdown and
+    use close_browser_session when a single chat ends.
+    """
+    global _playwright, _context, _page, _http_client
+    if _context:
+        await _context.close()
     if _playwright:
-        _playwright.stop()
-    _playwright = _browser = _page = None
+        await _playwright.stop()
+    if _http_client:
+        await _http_client.aclose()
+    _origin_pages.clear()
+    _active_pages.clear()
+    _playwright = _context = _page = _http_client = None
+
+
+
+async def close_browser_session(session_id: str) -> None:
+    """Closes a chat session's pages, keeping the shared browser running."""
+    session_keys = [key for key in _origin_pages if key[0] == session_id]
+    pages = [_origin_pages.pop(key) for key in session_keys]
+    active = _active_pages.pop(session_id, None)
+    if active is not None and active not in pages:
+        pages.append(active)
+    for page in pages:
+        # The initial page keeps the persistent context alive for other sessions
+        if page is not _page and not page.is_closed():
+            await page.close()
 
 
 
-def get_page() -> Page:
-    """Returns the active page, initializing the browser if needed."""
-    global _page
+def set_browser_session(session_id: str) -> None:
+    """Binds the current task (and tasks it spawns) to a browser session."""
+    _browser_session.set(session_id)
+
+
+
+async def get_page() -> Page:
+    """Returns the session's active page, initializing the browser if needed."""
     if _page is None:
-        return init_browser()
-    return _page
+        await init_browser()
+    session = _browser_session.get()
+    page = _active_pages.get(session)
+    if page is None or page.is_closed():
+        if session == "" and not _page.is_closed():
+            page = _page
+        else:
+            page = await _context.new_page()
+        _active_pages[session] = page
+    return page
+
+
+
+async def get_origin_page(url: str) -> Page:
+    """
+    Returns the page for the URL's origin and makes it the active page.
+
+    The session's first page is claimed by the first origin it opens;
+    later origins get a new page. At most MAX_ORIGIN_PAGES are kept open
+    per session, closing that session's least recently used one.
+    """
+    active = await get_page()
+    session = _browser_session.get()
+    key = (session, urlparse(url).netloc)
+
+    page = _origin_pages.get(key)
+    if page is None or page.is_closed():
+        if active in _origin_pages.values():
+            page = await _context.new_page()
+        else:
+            page = active
+        _origin_pages[key] = page
+        session_keys = [k for k in _origin_pages if k[0] == session]
+        for old_key in session_keys[:-MAX_ORIGIN_PAGES]:
+            await _origin_pages.pop(old_key).close()
+    _origin_pages.move_to_end(key)
+
+    if page is not active:
+        await page.bring_to_front()
+    _active_pages[session] = page
+    return page
+
+
+
+async def wait_for_settle(page: Page, state: str, timeout: int) -> None:
+    """Waits for a load state, giving up quietly after timeout ms."""
+    try:
+        await page.wait_for_load_state(state, timeout=timeout)
+    except PlaywrightTimeoutError:
+        pass
+
+
+
+def _json_dumps(data) -> str:
+    """Serializes tool output to a compact JSON string."""
+    return orjson.dumps(data).decode()
+
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Returns the shared HTTP client, creating it on first use."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            headers={"User-Agent": _USER_AGENT},
+            timeout=10,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _http_client
+
+
+
+async def prewarm_http_pool() -> None:
+    """
+    Opens keep-alive connections to the DuckDuckGo hosts ahead of the first
+    search, so it skips the TCP/TLS handshake. No-op unless PREWARM_ENABLED.
+    """
+    if not PREWARM_ENABLED:
+        return
+    client = get_http_client()
+    for url in (_DDG_API_URL, _DDG_URL):
+        try:
+            await client.head(url.format(""))
+        except httpx.HTTPError:
+            pass
+
+
+
+def _topic_results(topics: list) -> list[dict]:
+    """Maps Instant Answer topic entries to results, skipping DuckDuckGo's own pages."""
+    results = []
+    for topic in topics:
+        # Category entries nest their topics one level down
+        for item in topic.get("Topics", [topic]):
+            link = item.get("FirstURL", "")
+            if not link or urlparse(link).hostname in ("duckduckgo.com", "www.duckduckgo.com"):
+                continue
+            text = item.get("Text", "")
+            results.append({"title": text.partition(" - ")[0], "url": link, "snippet": text})
+    return results
+
+
+
+async def instant_answer_results(query: str) -> list[dict]:
+    """
+    Returns results from the DuckDuckGo Instant Answer API.
+
+    Official-site entries come first, titled with the answer's heading,
+    followed by the abstract source and related topics. Only entries that
+    point outside duckduckgo.com are kept. Generic queries usually yield an
+    empty list.
+    """
+    response = await get_http_client().get(
+        _DDG_API_URL.format(quote_plus(query)),
+        timeout=INSTANT_ANSWER_TIMEOUT_SECONDS,
+        follow_redirects=False,  # e.g. !bang queries redirect to other sites
+    )
+    if not response.is_success:
+        return []
+    data = response.json()
+    heading = data.get("Heading", "")
+
+    # "Results" holds the official site, with a generic "Official site" text
+    results = [
+        entry | {"title": heading or entry["title"]}
+        for entry in _topic_results(data.get("Results", []))
+    ]
+    if data.get("AbstractURL"):
+        results.append(
+            {
+                "title": heading,
+                "url": data["AbstractURL"],
+                "snippet": data.get("AbstractText", ""),
+            }
+        )
+    results.extend(_topic_results(data.get("RelatedTopics", [])))
+    return results[:SEARCH_MAX_RESULTS]
+
+
+
+async def html_results(query: str) -> list[dict]:
+    """Returns results scraped from the head of the DuckDuckGo HTML results page."""
+    chunks = []
+    size = 0
+    async with get_http_client().stream("GET", _DDG_URL.format(quote_plus(query))) as response:
+        async for chunk in response.aiter_bytes():
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= SEARCH_MAX_HTML_BYTES:
+                break
+    # lxml recovers from the truncated markup
+    doc = lxml_html.fromstring(b"".join(chunks)[:SEARCH_MAX_HTML_BYTES])
+
+    results = []
+    for result in _RESULT_XPATH(doc)[:SEARCH_MAX_RESULTS]:
+        title = "".join(_TITLE_XPATH(result)).strip()
+        link = "".join(_URL_XPATH(result)).strip()
+        snippet = "".join(_SNIPPET_XPATH(result)).strip()
+
+        # Normalize URL
+        if link and not link.startswith("http"):
+            link = "https://" + link
+
+        if title or link:
+            results.append({"title": title, "url": link, "snippet": snippet})
+    return results
 
 
 # Tools
 
 
 @tool
-def search_web(query: str) -> str:
+async def search_web(query: str) -> str:
     """
     Searches the web for relevant results and returns structured results.
 
@@ -75,46 +437,45 @@ def search_web(query: str) -> str:
     Returns:
         JSON string with a list of search results: [{title, url, snippet}]
     """
-    try:
-        import httpx
-        from bs4 import BeautifulSoup
-
-        headers = {
-            "User-Agent": (
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
-            )
-        }
-        url = f"https://html.duckduckgo.com/html/?q={httpx.utils.quote(query)}"
-        response = httpx.get(url, headers=headers, timeout=10, follow_redirects=True)
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        results = []
-        for result in soup.select(".result")[:8]:
-            title_el = result.select_one(".result__title")
-            url_el = result.select_one(".result__url")
-            snippet_el = result.select_one(".result__snippet")
-
-            title = title_el.get_text(strip=True) if title_el else ""
-            link = url_el.get_text(strip=True) if url_el else ""
-            snippet = snippet_el.get_text(strip=True) if snippet_el else ""
-
-            # Normalize URL
-            if link and not link.startswith("http"):
-                link = "https://" + link
+    # Repeated queries (retries, re-plans) are served from the cache
+    cache_key = " ".join(query.lower().split())
+    cached = _search_cache.get(cache_key)
+    if cached and time.monotonic() - cached[0] < SEARCH_CACHE_TTL_SECONDS:
+        _search_cache.move_to_end(cache_key)
+        return cached[1]
 
-            if title or link:
-                results.append({"title": title, "url": link, "snippet": snippet})
-
-        return json.dumps(results, ensure_ascii=False, indent=2)
+    try:
+        try:
+            results = await instant_answer_results(query)
+        except Exception:  # Timeout, non-JSON body, unexpected shape: use the HTML page
+            results = []
+        if len(results) < INSTANT_ANSWER_MIN_RESULTS:
+            try:
+                organic = await html_results(query)
+            except Exception:
+                if not results:
+                    raise
+                organic = []
+            seen = {result["url"] for result in results}
+            results += [result for result in organic if result["url"] not in seen]
+            results = results[:SEARCH_MAX_RESULTS]
+        output = _json_dumps(results)
+
+        # Only non-empty responses are cached (errors and blocked pages are not)
+        if results:
+            _search_cache[cache_key] = (time.monotonic(), output)
+            _search_cache.move_to_end(cache_key)
+            while len(_search_cache) > SEARCH_CACHE_MAX_ENTRIES:
+                _search_cache.popitem(last=False)
+
+        return output
 
     except Exception as exc:
-        return json.dumps({"error": str(exc)})
+        return _json_dumps({"error": str(exc)})
 
 
 @tool
-def open_url(url: str) -> str:
+async def open_url(url: str) -> str:
     """
     Opens a URL in the controlled browser session.
 
@@ -129,24 +490,22 @@ def open_url(url: str) -> str:
         String with page title and final URL after navigation.
     """
     try:
-        page = get_page()
-        page.goto(url, wait_until="domcontentloaded", timeout=30000)
-        time.sleep(1.5)  # Wait for JS render
-        title = page.title()
-        current = page.url
-        return f"Page loaded successfully.\nTitle: {title}\nCurrent URL: {current}"
+        page = await get_origin_page(url)
+        await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+        await wait_for_settle(page, "networkidle", 3000)  # Let JS render
+        info = await page.evaluate("() => ({title: document.title, url: location.href})")
+        return f"Page loaded successfully.\nTitle: {info['title']}\nCurrent URL: {info['url']}"
     except Exception as exc:
         return f"Error opening URL '{url}': {exc}"
 
 
 @tool
-def click_element(selector: str) -> str:
+async def click_element(selector: str) -> str:
     """
     Clicks an element in the page using a CSS selector or text content.
 
-    Attempts to click the element identified by the CSS selector. If the
-    selector is not found, tries to locate a visible element containing
-    the provided text.
+    Waits once for whichever appears first: an element matching the CSS
+    selector or a visible element containing the provided text.
 
     Args:
         selector: CSS selector (e.g. 'button.cta') or text to match
@@ -156,107 +515,99 @@ def click_element(selector: str) -> str:
         Confirmation message or error description.
     """
     try:
-        page = get_page()
+        page = await get_page()
+        text = selector.removeprefix("text=").strip()
+        by_text = page.get_by_text(text, exact=False)
 
-        # Try direct CSS selector
+        # Race the CSS selector and the text match in a single wait
+        locator = page.locator(selector).or_(by_text).filter(visible=True).first
         try:
-            page.wait_for_selector(selector, timeout=5000, state="visible")
-            page.click(selector)
-            time.sleep(1)
-            return f"Element '{selector}' clicked successfully. Current URL: {page.url}"
-        except Exception:
-            pass
+            await locator.click(timeout=5000)
+        except PlaywrightTimeoutError:
+            raise
+        except PlaywrightError:
+            # Not a valid CSS selector: match by text only
+            await by_text.filter(visible=True).first.click(timeout=5000)
 
-        # Fallback: search by visible text
-        text = selector.replace("text=", "").strip()
-        locator = page.get_by_text(text, exact=False).first
-        locator.click(timeout=5000)
-        time.sleep(1)
-        return f"Element with text '{text}' clicked. Current URL: {page.url}"
+        await wait_for_settle(page, "load", 2000)
+        return f"Element '{selector}' clicked successfully. Current URL: {page.url}"
 
     except Exception as exc:
         return f"Error clicking '{selector}': {exc}"
 
 
 @tool
-def type_text(selector: str, text: str) -> str:
+async def type_text(selector: str, text: str, human: bool = False) -> str:
     """
     Types text into an input field specified by CSS selector.
 
-    Clears the field first, then types the text with a short delay to
-    simulate human typing.
+    Replaces the field value in one step. With human=True the field is
+    cleared and the text is typed key by key with a short delay, for
+    pages that react to individual keystrokes.
 
     Args:
         selector: CSS selector of the input field (e.g. 'input[name="email"]')
         text: Text to type into the field
+        human: Type key by key like a person (default False)
 
     Returns:
         Confirmation message or error description.
     """
     try:
-        page = get_page()
-        page.wait_for_selector(selector, timeout=5000, state="visible")
-        page.fill(selector, "")  # Clear field
-        page.type(selector, text, delay=50)  # Simulate human typing
+        page = await get_page()
+        await page.wait_for_selector(selector, timeout=5000, state="visible")
+        if human:
+            await page.fill(selector, "")  # Clear field
+            await page.type(selector, text, delay=50)
+        else:
+            await page.fill(selector, text)
         return f"Text '{text}' typed into field '{selector}'."
     except Exception as exc:
         return f"Error typing into '{selector}': {exc}"
 
 
 @tool
-def extract_page_elements() -> str:
+async def extract_page_elements(max_n: int = 40) -> str:
     """
     Extracts visible interactive elements from the current page.
 
-    Scans the page for links, buttons, inputs, and related elements.
+    Scans the page for links, buttons, inputs, and related elements and
+    stops after max_n visible matches.
     Returns a structured list with text, type, selector hints, and href.
 
+    Args:
+        max_n: Maximum number of elements to return (default 40)
+
     Returns:
         JSON string with a list of visible interactive elements.
     """
     try:
-        page = get_page()
-        elements = page.evaluate(
-            """
-            () => {
-                const selectors = ['a', 'button', 'input', 'select', 'textarea', '[role="button"]', '[onclick]'];
-                const results = [];
-                const seen = new Set();
-
-                selectors.forEach(sel => {
-                    document.querySelectorAll(sel).forEach(el => {
-                        if (seen.has(el)) return;
-                        seen.add(el);
-
-                        const rect = el.getBoundingClientRect();
-                        if (rect.width === 0 || rect.height === 0) return;
-
-                        const text = (el.innerText || el.value || el.placeholder || el.getAttribute('aria-label') || '').trim().slice(0, 80);
-                        const tag = el.tagName.toLowerCase();
-                        const type = el.type || '';
-                        const href = el.href || '';
-                        const cls = el.className || '';
-                        const id = el.id || '';
-
-                        // Build a representative CSS selector hint
-                        let hint = tag;
-                        if (id) hint = `#${id}`;
-                        else if (cls) hint = `${tag}.${cls.split(' ')[0]}`;
-
-                        results.push({ tag, type, text, href, hint, id, cls: cls.slice(0, 60) });
-                    });
-                });
-                return results;
-            }
-            """
-        )
-        return json.dumps(elements[:40], ensure_ascii=False, indent=2)
+        page = await get_page()
+        max_n = max(1, int(max_n))
+        columns = await page.evaluate(_CALL_EXTRACT_ELEMENTS_JS, max_n)
+        if columns is None:
+            # Page loaded before the helper was registered
+            await page.evaluate(_EXTRACT_ELEMENTS_JS)
+            columns = await page.evaluate(_CALL_EXTRACT_ELEMENTS_JS, max_n)
+        elements = [
+            {"tag": tag, "type": type_, "text": text, "href": href, "hint": hint, "id": id_, "cls": cls}
+            for tag, type_, text, href, hint, id_, cls in zip(
+                columns["tags"],
+                columns["types"],
+                columns["texts"],
+                columns["hrefs"],
+                columns["hints"],
+                columns["ids"],
+                columns["classes"],
+            )
+        ]
+        return _json_dumps(elements)
     except Exception as exc:
-        return json.dumps({"error": str(exc)})
+        return _json_dumps({"error": str(exc)})
 
 
 @tool
-def get_current_url() -> str:
+async def get_current_url() -> str:
     """
     Returns the current URL of the browser session.
 
@@ -266,14 +617,14 @@ def get_current_url() -> str:
         The current full URL string.
     """
     try:
-        page = get_page()
+        page = await get_page()
         return page.url
     except Exception as exc:
         return f"Error getting current URL: {exc}"
 
 
 @tool
-def scroll_page(direction: str = "down", amount: int = 500) -> str:
+async def scroll_page(direction: str = "down", amount: int = 500) -> str:
     """
     Scrolls the current page up or down to reveal more content.
 
@@ -287,10 +638,11 @@ def scroll_page(direction: str = "down", amount: int = 500) -> str:
         Confirmation message.
     """
     try:
-        page = get_page()
+        page = await get_page()
         delta_y = amount if direction == "down" else -amount
-        page.evaluate(f"window.scrollBy(0, {delta_y})")
-        time.sleep(0.8)
+        await page.evaluate(f"window.scrollBy(0, {delta_y})")
+        # Wait one frame so the scroll is painted and lazy content can start
+        await page.evaluate("() => new Promise(r => requestAnimationFrame(() => r()))")
         return f"Page scrolled {direction} by {amount}px."
     except Exception as exc:
         return f"Error scrolling page: {exc}"